@@ -7,23 +7,45 @@ Goal:
 - Produce a structured clinical output (assistive, not diagnostic)
 - If info isn't found in sources -> say so clearly (no guessing)
 
-How to run (later on your laptop):
+How to run (later on your laptop; requires Python 3.10+):
     python -m app.pipeline --question "Adult shortness of breath approach" --top_k 8
 """
 
 from __future__ import annotations
 
 import argparse
+import hashlib
+import heapq
+import importlib.metadata
+import importlib.util
 import os
+import pickle
 import re
 import math
-from dataclasses import dataclass
-from typing import List, Tuple, Dict, Optional
+import sys
+import tempfile
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field, replace
+from typing import List, Tuple, Dict, Iterable, Iterator, Optional
+
+# Chunk/SourceSpan use @dataclass(slots=True), added in Python 3.10
+if sys.version_info < (3, 10):
+    raise RuntimeError("ai-doctor-assistant requires Python 3.10+ (found %d.%d)" % sys.version_info[:2])
 
 # --- Config (repo-relative paths) ---
 REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 PDF_DIR = os.path.join(REPO_ROOT, "data", "pdfs")
 STYLE_GUIDE_PATH = os.path.join(REPO_ROOT, "style_guide.md")
+CACHE_DIR = os.path.join(REPO_ROOT, "data", ".cache")
+
+# Bump when Chunk/SimpleRetriever layout or chunking changes, so stale
+# cached indexes are rebuilt instead of unpickled.
+INDEX_VERSION = 10
+# Temp files older than this are leftovers from a killed cache write
+_STALE_TMP_SECONDS = 3600
 
 # --- Safety / discipline ---
 SAFETY_NOTICE = (
@@ -31,101 +53,208 @@ SAFETY_NOTICE = (
     "Final clinical decisions must be made by a licensed physician."
 )
 
+# --- Text patterns (compiled once) ---
+_WS_RE = re.compile(r"[ \t]+")
+_NL_RE = re.compile(r"\n{3,}")
+_WS_ALL_RE = re.compile(r"\s+")
+_TOKEN_RE = re.compile(r"[a-z0-9\-]+")
+_NUL_TO_SPACE = {0: 0x20}
+# PDFium emits CRLF line breaks and U+FFFE for line-break hyphens ("consid\ufffeered")
+_PDFIUM_TEXT_FIXES = {0x0D: None, 0xFFFE: None}
+
+# --- Output headings per language ---
+# We keep medical logic same; only headings change.
+HEADINGS: Dict[str, Dict[str, str]] = {
+    "en": {
+        "title": "Assistive answer (ONLY from uploaded sources)",
+        "summary": "Clinical Summary",
+        "redflags": "Red Flags (Must-Not-Miss)",
+        "ddx": "Differential Diagnosis (Ranked)",
+        "workup": "Recommended Initial Workup",
+        "management": "Initial Management",
+        "refs": "Supporting Extracts (with citations)",
+        "notfound": "Not found in the provided references",
+    },
+    "ar": {
+        "title": "إجابة داعمة (من المصادر المرفوعة فقط)",
+        "summary": "ملخص سريري",
+        "redflags": "إنذارات خطر",
+        "ddx": "تشخيصات تفريقية (مرتبة)",
+        "workup": "فحوصات/تقييم أولي",
+        "management": "تدبير أولي",
+        "refs": "المراجع (مقاطع داعمة)",
+        "notfound": "غير موجود في المصادر المرفوعة",
+    },
+}
+
+# --- Heuristic extract grouping (substring keywords per section) ---
+KEYWORD_GROUPS: Dict[str, List[str]] = {
+    "redflags": ["red flag", "hypotension", "syncope", "shock", "altered", "cyanosis", "hemoptysis", "chest pain"],
+    "workup": ["ecg", "troponin", "x-ray", "ct", "d-dimer", "abg", "vbg", "labs", "imaging", "ultrasound", "spo2", "pulse oximetry"],
+    "management": ["oxygen", "bronchodilator", "nebul", "antibiotic", "anticoag", "diuretic", "steroid", "epinephrine", "intub", "ventilation"],
+    "ddx": ["differential", "asthma", "copd", "pneumonia", "pe", "pulmonary embol", "heart failure", "acs", "pneumothorax", "anxiety"],
+}
+# Section order in the output, with the label used in "not found" lines
+GROUPED_SECTIONS: Tuple[Tuple[str, str], ...] = (
+    ("redflags", "red-flag"),
+    ("ddx", "DDx"),
+    ("workup", "workup"),
+    ("management", "management"),
+)
+# One alternation per group: a single C-level scan instead of a Python `in` per keyword
+_KEYWORD_GROUP_RES = {
+    group: re.compile("|".join(map(re.escape, keywords))) for group, keywords in KEYWORD_GROUPS.items()
+}
+
 # =========================
 # Data structures
 # =========================
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SourceSpan:
     pdf_file: str
     page: int  # 1-based page number
     text: str
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Chunk:
-    pdf_file: str
-    page: int
+    # (pdf_file, 1-based page) for every place this exact text occurs;
+    # identical chunks are collapsed at ingest, so len(sources) is its multiplicity
+    sources: Tuple[Tuple[str, int], ...]
     text: str
-    tokens: List[str]
+    # term ids (array('i')) into the corpus vocabulary; derived from text, so
+    # left out of eq/hash (an array is unhashable)
+    tokens: array = field(compare=False)
 
 # =========================
 # Utilities
 # =========================
 
 def normalize_text(s: str) -> str:
-    s = s.replace("\x00", " ")
-    s = re.sub(r"[ \t]+", " ", s)
-    s = re.sub(r"\n{3,}", "\n\n", s)
+    s = s.translate(_NUL_TO_SPACE)
+    s = _WS_RE.sub(" ", s)
+    s = _NL_RE.sub("\n\n", s)
     return s.strip()
 
 def simple_tokenize(s: str) -> List[str]:
-    s = s.lower()
-    s = re.sub(r"[^a-z0-9\s\-]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    if not s:
-        return []
-    return s.split()
+    # Tokens are runs of [a-z0-9-]; everything else is a separator
+    return _TOKEN_RE.findall(s.lower())
 
 def list_pdfs(pdf_dir: str) -> List[str]:
     if not os.path.isdir(pdf_dir):
         return []
-    files = []
-    for fn in os.listdir(pdf_dir):
-        if fn.lower().endswith(".pdf"):
-            files.append(os.path.join(pdf_dir, fn))
+    # scandir entries already carry their path and (cached) file type
+    with os.scandir(pdf_dir) as it:
+        files = [e.path for e in it if e.name.lower().endswith(".pdf") and e.is_file()]
     return sorted(files)
 
 # =========================
 # PDF Loading
 # =========================
 
-def extract_pdf_pages(pdf_path: str) -> List[SourceSpan]:
+def _pdf_backend() -> Tuple[str, str]:
     """
-    Extract text per page with (file, page, text).
-    Tries 'pypdf' first. If missing, raises a helpful error.
+    (name, version) of the PDF library _read_page_texts will use,
+    or ("", "") if none is installed.
+    Detected without importing, so warm-cache runs never load PDFium.
+    """
+    for name in ("pypdfium2", "pypdf"):
+        if importlib.util.find_spec(name) is None:
+            continue
+        try:
+            return name, importlib.metadata.version(name)
+        except importlib.metadata.PackageNotFoundError:
+            return name, ""
+    return "", ""
+
+def _read_page_texts(pdf_path: str) -> Iterator[str]:
+    """
+    Raw text of each page, in order, yielded one page at a time.
+    Tries 'pypdfium2' (C PDFium, much faster) first, then 'pypdf'.
+    If neither is installed, raises a helpful error.
     """
+    try:
+        import pypdfium2 as pdfium  # type: ignore
+    except ImportError:
+        pdfium = None
+
+    if pdfium is not None:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            for i in range(len(pdf)):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                raw = textpage.get_text_range().translate(_PDFIUM_TEXT_FIXES)
+                textpage.close()
+                page.close()
+                yield raw
+        finally:
+            pdf.close()
+        return
+
     try:
         from pypdf import PdfReader  # type: ignore
     except Exception as e:
         raise RuntimeError(
-            "Missing dependency 'pypdf'. Install later with: pip install pypdf"
+            "Missing PDF dependency. Install later with: pip install pypdfium2 (or: pip install pypdf)"
         ) from e
 
     reader = PdfReader(pdf_path)
-    spans: List[SourceSpan] = []
+    for page in reader.pages:
+        yield page.extract_text() or ""
+
+def extract_pdf_pages(pdf_path: str) -> Iterator[SourceSpan]:
+    """
+    Extract text per page with (file, page, text).
+    Yields spans lazily, so on the serial ingest path pages flow straight into
+    chunking. The process-pool path collects one PDF's spans per worker
+    (see _extract_pdf_spans), so there a whole PDF's text is held at once.
+    """
     base = os.path.basename(pdf_path)
 
-    for i, page in enumerate(reader.pages):
-        raw = page.extract_text() or ""
+    for i, raw in enumerate(_read_page_texts(pdf_path)):
         txt = normalize_text(raw)
         if txt:
-            spans.append(SourceSpan(pdf_file=base, page=i + 1, text=txt))
-    return spans
+            yield SourceSpan(pdf_file=base, page=i + 1, text=txt)
+
+def _extract_pdf_spans(pdf_path: str) -> List[SourceSpan]:
+    # Worker-process entry point: generators can't be pickled back to the parent,
+    # so the PDF's spans (text only, not parser objects) are returned as a list
+    return list(extract_pdf_pages(pdf_path))
+
+def token_ids(s: str, vocab: Dict[str, int]) -> array:
+    """
+    Tokenize and intern each token as an int id (new terms are added to vocab).
+    4 bytes per token instead of a str reference per token.
+    """
+    return array("i", [vocab.setdefault(t, len(vocab)) for t in simple_tokenize(s)])
 
-def make_chunks(spans: List[SourceSpan], max_chars: int = 1200, overlap_chars: int = 200) -> List[Chunk]:
+def make_chunks(spans: Iterable[SourceSpan], vocab: Dict[str, int], max_chars: int = 1200, overlap_chars: int = 200) -> Iterator[Chunk]:
     """
     Split each page into overlapping chunks for retrieval.
+    Tokens are stored as ids into the shared corpus vocab.
+    Consumes spans lazily and yields chunks as they are produced.
+    Chunks without any token (page numbers, bullets, symbols only) can never
+    match a query, so they are skipped instead of indexed.
     """
-    chunks: List[Chunk] = []
     for sp in spans:
         text = sp.text
         if len(text) <= max_chars:
-            toks = simple_tokenize(text)
-            chunks.append(Chunk(pdf_file=sp.pdf_file, page=sp.page, text=text, tokens=toks))
+            toks = token_ids(text, vocab)
+            if toks:
+                yield Chunk(sources=((sp.pdf_file, sp.page),), text=text, tokens=toks)
             continue
 
-        start = 0
-        while start < len(text):
-            end = min(len(text), start + max_chars)
-            piece = text[start:end]
-            piece = normalize_text(piece)
-            if piece:
-                toks = simple_tokenize(piece)
-                chunks.append(Chunk(pdf_file=sp.pdf_file, page=sp.page, text=piece, tokens=toks))
+        # Page text is already normalized; windows only need their edges trimmed
+        stride = max(1, max_chars - overlap_chars)
+        for start in range(0, len(text), stride):
+            end = start + max_chars
+            piece = text[start:end].strip()
+            toks = token_ids(piece, vocab)
+            if toks:
+                yield Chunk(sources=((sp.pdf_file, sp.page),), text=piece, tokens=toks)
             if end >= len(text):
                 break
-            start = max(0, end - overlap_chars)
-    return chunks
 
 # =========================
 # Retrieval (no internet)
@@ -133,48 +262,67 @@ def make_chunks(spans: List[SourceSpan], max_chars: int = 1200, overlap_chars: i
 
 class SimpleRetriever:
     """
-    Lightweight TF-IDF-ish scoring without external libs.
-    - Builds document frequency over chunks
-    - Scores by sum(tf * idf) over query tokens
+    Lightweight BM25 (Okapi) scoring without external libs.
+    - Builds document frequency and an inverted index once at ingest
+    - Scores by sum(idf * saturated, length-normalized tf) over query tokens,
+      visiting only chunks that contain at least one of them
     """
-    def __init__(self, chunks: List[Chunk]):
+    def __init__(self, chunks: List[Chunk], vocab: Dict[str, int], k1: float = 1.5, b: float = 0.75):
         self.chunks = chunks
-        self.df: Dict[str, int] = {}
         self.N = len(chunks)
-
-        for ch in chunks:
-            seen = set(ch.tokens)
-            for t in seen:
-                self.df[t] = self.df.get(t, 0) + 1
-
-    def idf(self, term: str) -> float:
-        # Smoothed IDF
-        df = self.df.get(term, 0)
-        return math.log((self.N + 1) / (df + 1)) + 1.0
-
-    def score_chunk(self, q_tokens: List[str], ch: Chunk) -> float:
-        if not q_tokens or not ch.tokens:
-            return 0.0
-        # term frequency in chunk
-        tf: Dict[str, int] = {}
-        for t in ch.tokens:
-            tf[t] = tf.get(t, 0) + 1
-
-        score = 0.0
-        for qt in q_tokens:
-            if qt in tf:
-                score += (1 + math.log(tf[qt])) * self.idf(qt)
-        return score
+        # Corpus vocabulary the chunk token ids refer to (term -> term id)
+        self.vocab = vocab
+        self.k1 = k1
+        self.b = b
+        self.lengths: List[int] = [len(ch.tokens) for ch in chunks]
+        total = sum(self.lengths)
+        self.avgdl = total / self.N if total else 0.0
+
+        # BM25 tf component depends only on (tf, chunk length), so it is
+        # computed here once: tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)).
+        # Long pages no longer dominate just by repeating terms.
+        # Inverted index by term id: [(chunk index, BM25 tf weight)]
+        postings: List[List[Tuple[int, float]]] = [[] for _ in range(len(vocab))]
+        for i, ch in enumerate(chunks):
+            # avgdl == 0 only for an all-empty corpus; skip length normalization then
+            norm = k1 * (1 - b + b * self.lengths[i] / self.avgdl) if self.avgdl else k1
+            for tid, c in Counter(ch.tokens).items():
+                postings[tid].append((i, c * (k1 + 1) / (c + norm)))
+
+        # Flattened into typed CSC arrays (one column per term id): the postings
+        # of term t are indices/weights[indptr[t]:indptr[t + 1]]. ~12 bytes per
+        # posting instead of a tuple of two boxed numbers, and cheap to pickle.
+        self.indptr = array("q", [0])
+        self.indices = array("i")
+        self.weights = array("d")
+        for plist in postings:
+            self.indices.extend(i for i, _ in plist)
+            self.weights.extend(w for _, w in plist)
+            self.indptr.append(len(self.indices))
+
+        # Smoothed IDF per term id (df = postings length), so scoring
+        # never calls math.log at query time.
+        indptr = self.indptr
+        self.idf_vec = array(
+            "d", (math.log((self.N + 1) / (indptr[t + 1] - indptr[t] + 1)) + 1.0 for t in range(len(postings)))
+        )
 
     def search(self, query: str, top_k: int = 8) -> List[Tuple[float, Chunk]]:
-        q_tokens = simple_tokenize(query)
-        scored: List[Tuple[float, Chunk]] = []
-        for ch in self.chunks:
-            s = self.score_chunk(q_tokens, ch)
-            if s > 0:
-                scored.append((s, ch))
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return scored[:top_k]
+        # Per-query work up front: map tokens to ids (unknown terms can't match),
+        # collapse repeated terms, and look up each idf once.
+        q_ids = dict.fromkeys(tid for tid in map(self.vocab.get, simple_tokenize(query)) if tid is not None)
+        q_idfs = [(tid, self.idf_vec[tid]) for tid in q_ids]
+        scores: Dict[int, float] = defaultdict(float)
+        indptr, indices, weights = self.indptr, self.indices, self.weights
+        for tid, idf in q_idfs:
+            lo, hi = indptr[tid], indptr[tid + 1]
+            for i, w in zip(indices[lo:hi], weights[lo:hi]):
+                scores[i] += w * idf
+
+        # Only top_k are needed: O(P log k) instead of sorting all P candidates.
+        # Ties keep corpus order, same as a full scan would.
+        ranked = heapq.nlargest(top_k, scores.items(), key=lambda x: (x[1], -x[0]))
+        return [(s, self.chunks[i]) for i, s in ranked]
 
 # =========================
 # Output formatting (your style guide)
@@ -186,9 +334,12 @@ def load_style_guide(path: str) -> str:
     with open(path, "r", encoding="utf-8") as f:
         return f.read()
 
-def format_citation(pdf_file: str, page: int) -> str:
-    # concise citation format
-    return f"[{pdf_file} p.{page}]"
+def format_citation(sources: Tuple[Tuple[str, int], ...], max_refs: int = 3) -> str:
+    # concise citation format; repeated (deduplicated) passages list a few locations
+    refs = "; ".join(f"{pdf_file} p.{page}" for pdf_file, page in sources[:max_refs])
+    if len(sources) > max_refs:
+        refs += f"; +{len(sources) - max_refs} more"
+    return f"[{refs}]"
 
 def build_assistive_output(question: str, hits: List[Tuple[float, Chunk]], language: str = "en") -> str:
     """
@@ -198,47 +349,25 @@ def build_assistive_output(question: str, hits: List[Tuple[float, Chunk]], langu
     - We keep structure consistent (matches your style_guide concept)
     """
 
-    if language not in ("en", "ar"):
-        language = "en"
-
-    if language == "ar":
-        # We keep medical logic same; only headings change.
-        H = {
-            "title": "إجابة داعمة (من المصادر المرفوعة فقط)",
-            "summary": "ملخص سريري",
-            "redflags": "إنذارات خطر",
-            "ddx": "تشخيصات تفريقية (مرتبة)",
-            "workup": "فحوصات/تقييم أولي",
-            "management": "تدبير أولي",
-            "refs": "المراجع (مقاطع داعمة)",
-            "notfound": "غير موجود في المصادر المرفوعة",
-        }
-    else:
-        H = {
-            "title": "Assistive answer (ONLY from uploaded sources)",
-            "summary": "Clinical Summary",
-            "redflags": "Red Flags (Must-Not-Miss)",
-            "ddx": "Differential Diagnosis (Ranked)",
-            "workup": "Recommended Initial Workup",
-            "management": "Initial Management",
-            "refs": "Supporting Extracts (with citations)",
-            "notfound": "Not found in the provided references",
-        }
-
-    lines: List[str] = []
-    lines.append(f"# {H['title']}")
-    lines.append("")
-    lines.append(f"**Question:** {question}")
-    lines.append("")
-    lines.append(f"**Safety notice:** {SAFETY_NOTICE}")
-    lines.append("")
+    H = HEADINGS.get(language, HEADINGS["en"])
+
+    lines: List[str] = [
+        f"# {H['title']}",
+        "",
+        f"**Question:** {question}",
+        "",
+        f"**Safety notice:** {SAFETY_NOTICE}",
+        "",
+    ]
 
     if not hits:
-        lines.append(f"## {H['summary']}")
-        lines.append(f"- {H['notfound']}.")
-        lines.append("")
-        lines.append(f"## {H['refs']}")
-        lines.append(f"- {H['notfound']}.")
+        lines.extend((
+            f"## {H['summary']}",
+            f"- {H['notfound']}.",
+            "",
+            f"## {H['refs']}",
+            f"- {H['notfound']}.",
+        ))
         return "\n".join(lines)
 
     # We do a conservative approach:
@@ -251,67 +380,49 @@ def build_assistive_output(question: str, hits: List[Tuple[float, Chunk]], langu
     extracts: List[str] = []
     used = set()
     for score, ch in hits:
-        key = (ch.pdf_file, ch.page, ch.text[:80])
+        key = (ch.sources[0], ch.text[:80])
         if key in used:
             continue
         used.add(key)
         snippet = ch.text
         # Keep snippet short to avoid dumping whole pages
         snippet = snippet[:400].strip()
-        snippet = re.sub(r"\s+", " ", snippet)
-        extracts.append(f"- {snippet} {format_citation(ch.pdf_file, ch.page)}")
+        snippet = _WS_ALL_RE.sub(" ", snippet)
+        extracts.append(f"- {snippet} {format_citation(ch.sources)}")
 
     # Heuristic grouping by keywords (simple, but useful)
-    def pick_by_keywords(keywords: List[str], max_items: int = 6) -> List[str]:
-        out = []
+    # Single pass: each extract is lowercased once and tested against every
+    # group still short of max_items; the scan stops once all groups are full.
+    # An extract may land in several groups.
+    def pick_by_keywords(max_items: int = 6) -> Dict[str, List[str]]:
+        out: Dict[str, List[str]] = {group: [] for group in _KEYWORD_GROUP_RES}
+        open_groups = dict(_KEYWORD_GROUP_RES)
         for ex in extracts:
-            low = ex.lower()
-            if any(k in low for k in keywords):
-                out.append(ex)
-            if len(out) >= max_items:
+            if not open_groups:
                 break
+            low = ex.lower()
+            for group, pattern in list(open_groups.items()):
+                if pattern.search(low):
+                    out[group].append(ex)
+                    if len(out[group]) >= max_items:
+                        del open_groups[group]
         return out
 
-    redflags = pick_by_keywords(["red flag", "hypotension", "syncope", "shock", "altered", "cyanosis", "hemoptysis", "chest pain"])
-    workup = pick_by_keywords(["ecg", "troponin", "x-ray", "ct", "d-dimer", "abg", "vbg", "labs", "imaging", "ultrasound", "spo2", "pulse oximetry"])
-    management = pick_by_keywords(["oxygen", "bronchodilator", "nebul", "antibiotic", "anticoag", "diuretic", "steroid", "epinephrine", "intub", "ventilation"])
-    ddx = pick_by_keywords(["differential", "asthma", "copd", "pneumonia", "pe", "pulmonary embol", "heart failure", "acs", "pneumothorax", "anxiety"])
-
-    lines.append(f"## {H['summary']}")
-    lines.append("- Summary is based on extracted passages below (assistive; not a final diagnosis).")
-    lines.append("")
-
-    lines.append(f"## {H['redflags']}")
-    if redflags:
-        lines.extend(redflags)
-    else:
-        lines.append(f"- {H['notfound']} for explicit red-flag statements in top matches.")
-    lines.append("")
-
-    lines.append(f"## {H['ddx']}")
-    if ddx:
-        lines.extend(ddx)
-    else:
-        lines.append(f"- {H['notfound']} for explicit DDx statements in top matches.")
-    lines.append("")
-
-    lines.append(f"## {H['workup']}")
-    if workup:
-        lines.extend(workup)
-    else:
-        lines.append(f"- {H['notfound']} for explicit workup statements in top matches.")
-    lines.append("")
+    grouped = pick_by_keywords()
 
-    lines.append(f"## {H['management']}")
-    if management:
-        lines.extend(management)
-    else:
-        lines.append(f"- {H['notfound']} for explicit management statements in top matches.")
-    lines.append("")
+    lines.extend((
+        f"## {H['summary']}",
+        "- Summary is based on extracted passages below (assistive; not a final diagnosis).",
+        "",
+    ))
+    for group, label in GROUPED_SECTIONS:
+        lines.append(f"## {H[group]}")
+        lines.extend(grouped[group] or (f"- {H['notfound']} for explicit {label} statements in top matches.",))
+        lines.append("")
 
     lines.append(f"## {H['refs']}")
     # Always show the top extracts (even if not grouped)
-    lines.extend(extracts[: min(10, len(extracts))])
+    lines.extend(extracts[:10])
 
     return "\n".join(lines)
 
@@ -319,21 +430,130 @@ def build_assistive_output(question: str, hits: List[Tuple[float, Chunk]], langu
 # Main pipeline
 # =========================
 
-def build_corpus_from_pdfs(pdf_dir: str) -> List[Chunk]:
+def dedup_chunks(chunks: Iterable[Chunk]) -> List[Chunk]:
+    """
+    Collapse chunks with identical text (repeated headers/footers, duplicated
+    pages) into one, keeping every (pdf_file, page) in its sources.
+    Input chunks are not modified; merged chunks are new instances.
+    """
+    first_by_text: Dict[str, Chunk] = {}
+    sources_by_text: Dict[str, List[Tuple[str, int]]] = {}
+    for ch in chunks:
+        if ch.text in first_by_text:
+            sources_by_text[ch.text].extend(ch.sources)
+        else:
+            first_by_text[ch.text] = ch
+            sources_by_text[ch.text] = list(ch.sources)
+
+    out: List[Chunk] = []
+    for text, ch in first_by_text.items():
+        sources = sources_by_text[text]
+        out.append(ch if len(sources) == len(ch.sources) else replace(ch, sources=tuple(sources)))
+    return out
+
+def build_corpus_from_pdfs(pdf_dir: str, vocab: Dict[str, int]) -> List[Chunk]:
+    """
+    Extract and chunk every PDF in pdf_dir; chunk token ids are added to vocab.
+    """
     pdfs = list_pdfs(pdf_dir)
     if not pdfs:
         raise RuntimeError(f"No PDFs found in: {pdf_dir}")
 
     all_chunks: List[Chunk] = []
-    for pdf in pdfs:
-        spans = extract_pdf_pages(pdf)
-        chunks = make_chunks(spans)
-        all_chunks.extend(chunks)
-
+    workers = min(len(pdfs), os.cpu_count() or 1)
+    if workers < 2:
+        # Single file or single core: not worth spawning worker processes.
+        # Pages stream straight into chunks without materializing the PDF.
+        for pdf in pdfs:
+            all_chunks.extend(make_chunks(extract_pdf_pages(pdf), vocab))
+    else:
+        # Text extraction is CPU-bound pure Python; fan out across cores.
+        # Results come back in input order, so chunk order stays deterministic.
+        chunksize = max(1, len(pdfs) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            for spans in ex.map(_extract_pdf_spans, pdfs, chunksize=chunksize):
+                all_chunks.extend(make_chunks(spans, vocab))
+
+    all_chunks = dedup_chunks(all_chunks)
     if not all_chunks:
         raise RuntimeError("PDFs were found but no extractable text was produced (may be scanned images).")
     return all_chunks
 
+def _corpus_fingerprint(pdf_dir: str) -> str:
+    # Any added/removed/modified PDF changes the key, and so does switching
+    # extraction library (pypdfium2 and pypdf produce different text).
+    # Pickles reference classes by module path, so that is part of the key too.
+    stats = sorted((p, os.path.getmtime(p), os.path.getsize(p)) for p in list_pdfs(pdf_dir))
+    key = (INDEX_VERSION, SimpleRetriever.__module__, _pdf_backend(), stats)
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+
+def _cache_prefix(pdf_dir: str) -> str:
+    # Files this code owns for one PDF dir: index-<dir key>-<fingerprint>.pkl
+    dir_key = hashlib.sha1(os.path.abspath(pdf_dir).encode("utf-8")).hexdigest()[:12]
+    return f"index-{dir_key}-"
+
+def load_or_build_retriever(pdf_dir: str, cache_dir: str = CACHE_DIR) -> SimpleRetriever:
+    """
+    Load the retriever index from the on-disk cache, or build and cache it.
+    The cache is keyed by the PDF set, so editing sources triggers a rebuild.
+    """
+    prefix = _cache_prefix(pdf_dir)
+    cache_path = os.path.join(cache_dir, f"{prefix}{_corpus_fingerprint(pdf_dir)}.pkl")
+    if os.path.isfile(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            pass  # unreadable/stale cache -> rebuild below
+
+    vocab: Dict[str, int] = {}
+    retriever = SimpleRetriever(build_corpus_from_pdfs(pdf_dir, vocab), vocab)
+    try:
+        _write_cache(retriever, cache_path, prefix)
+    except OSError:
+        pass  # read-only checkout / full disk: the cache is optional
+    return retriever
+
+def _write_cache(retriever: SimpleRetriever, cache_path: str, prefix: str) -> None:
+    cache_dir = os.path.dirname(cache_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Unique temp file, so concurrent cold runs never write to the same path
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=prefix, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(retriever, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    # Only touch our own files for this PDF dir: older indexes (previous PDF
+    # set / INDEX_VERSION) and temp files abandoned by killed runs. Recent
+    # temp files may belong to a concurrent run and are left alone.
+    keep = os.path.basename(cache_path)
+    tmp_cutoff = time.time() - _STALE_TMP_SECONDS
+    stale: List[str] = []
+    with os.scandir(cache_dir) as it:
+        for e in it:
+            if not e.name.startswith(prefix) or e.name == keep:
+                continue
+            if e.name.endswith(".pkl"):
+                stale.append(e.path)
+            elif e.name.endswith(".tmp"):
+                try:
+                    if e.stat().st_mtime < tmp_cutoff:
+                        stale.append(e.path)
+                except OSError:
+                    pass
+    for path in stale:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
 def main():
     parser = argparse.ArgumentParser(description="Local clinical PDF retrieval (assistive).")
     parser.add_argument("--question", required=True, help="Clinical question or scenario")
@@ -342,12 +562,17 @@ def main():
     args = parser.parse_args()
 
     _ = load_style_guide(STYLE_GUIDE_PATH)  # reserved for later rewrite step
-    chunks = build_corpus_from_pdfs(PDF_DIR)
-    retriever = SimpleRetriever(chunks)
+    retriever = load_or_build_retriever(PDF_DIR)
 
     hits = retriever.search(args.question, top_k=args.top_k)
     out = build_assistive_output(args.question, hits, language=args.lang)
     print(out)
 
 if __name__ == "__main__":
-    main()
+    # Dispatch through the importable module, so the cached pickle references
+    # app.pipeline.* rather than __main__.* and loads from either entry point.
+    try:
+        from app import pipeline as _pipeline
+    except ImportError:  # run as a plain script, not via `python -m app.pipeline`
+        _pipeline = None
+    (_pipeline.main if _pipeline is not None else main)()